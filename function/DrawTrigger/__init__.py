@@ -1,20 +1,88 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import io
 import json
 import logging
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, Iterable, List, Tuple
+from typing import TYPE_CHECKING, Dict, Iterable, List, Tuple
 
 import azure.functions as func
 import requests
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth
+from urllib3.util.retry import Retry
+
+from azure.core.credentials import TokenCredential
+from azure.identity import DefaultAzureCredential, ManagedIdentityCredential
+
+# The storage SDK and cloudnetdraw (which pulls in the network and resource
+# management SDKs) are imported where they are first used, keeping them off
+# the module import path the worker runs on a cold start.
+if TYPE_CHECKING:
+    from azure.storage.blob import BlobServiceClient
+    from cloudnetdraw.config import Config
+
+
+def create_credential() -> TokenCredential:
+    """Build the function's credential without probing developer-tool sources."""
+    # IDENTITY_ENDPOINT is set by the Functions host when a managed identity is
+    # available, so skip the DefaultAzureCredential chain entirely.
+    if os.environ.get("IDENTITY_ENDPOINT"):
+        return ManagedIdentityCredential(client_id=os.environ.get("AZURE_CLIENT_ID") or None)
+
+    return DefaultAzureCredential(
+        exclude_cli_credential=True,
+        exclude_developer_cli_credential=True,
+        exclude_powershell_credential=True,
+        exclude_visual_studio_code_credential=True,
+        exclude_shared_token_cache_credential=True,
+        exclude_interactive_browser_credential=True,
+    )
 
-from azure.identity import DefaultAzureCredential
-from azure.storage.blob import BlobServiceClient
 
-import cloudnetdraw.azure_client as azure_client
-from cloudnetdraw.config import Config
-from cloudnetdraw.diagram_generator import generate_hld_diagram, generate_mld_diagram
+# Shared across warm invocations so the cached AAD token and the blob HTTP
+# connection pool survive between timer runs on the same worker.
+_CREDENTIAL = create_credential()
+_BLOB_SERVICE_CLIENT: BlobServiceClient | None = None
+_BLOB_SERVICE_CLIENT_LOCK = threading.Lock()
+
+# Content hash of the last fully exported topology, kept in the drawing container
+TOPOLOGY_HASH_BLOB_NAME = "latest_topology.hash"
+
+BLOB_BLOCK_SIZE = 4 * 1024 * 1024
+BLOB_UPLOAD_CONCURRENCY = 4
+
+# Keep-alive connection pool for the Confluence REST calls; every attachment
+# lookup and upload otherwise pays for a fresh TCP and TLS handshake. Only the
+# adapter is shared: credentials live on a per-run Session that mounts it.
+# POST is retried too: attachment bodies are in-memory bytes, and a replayed
+# upload at worst adds an attachment version (Confluence rejects duplicate
+# filenames on create).
+_CONFLUENCE_HTTP_ADAPTER = HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=4,
+    max_retries=Retry(
+        total=3,
+        backoff_factor=0.5,
+        backoff_max=4,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=["GET", "POST"],
+        # An unbounded Retry-After would defeat the timeout budget below
+        respect_retry_after_header=False,
+        raise_on_status=False,
+    ),
+)
+
+# (connect, read) timeouts so a stalled socket cannot hold the invocation open.
+CONFLUENCE_LOOKUP_TIMEOUT = (2, 8)
+CONFLUENCE_UPLOAD_TIMEOUT = (2, 30)
 
 
 def main(mytimer: func.TimerRequest) -> None:
@@ -23,11 +91,22 @@ def main(mytimer: func.TimerRequest) -> None:
     logging.info("DrawTrigger function triggered")
 
     timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%d_%H-%M-%S")
-    credential = DefaultAzureCredential()
-    azure_client._credentials = credential
+
+    # Resolve storage before any discovery so a misconfigured deployment fails
+    # fast instead of after the ARM scrape and diagram rendering.
+    blob_service_client = get_blob_service_client()
+    if blob_service_client is None:
+        return
+
+    import cloudnetdraw.azure_client as azure_client
+
+    azure_client._credentials = _CREDENTIAL
 
     try:
-        subscription_ids = get_target_subscription_ids()
+        subscription_ids = get_configured_subscription_ids()
+        if not subscription_ids:
+            subscription_ids = azure_client.get_all_subscription_ids()
+            logging.info("No explicit subscription selection provided; discovered %s accessible subscriptions", len(subscription_ids))
         logging.info("Using %s subscriptions for topology discovery", len(subscription_ids))
     except Exception as exc:
         logging.exception("Failed to list subscriptions: %s", exc)
@@ -49,26 +128,65 @@ def main(mytimer: func.TimerRequest) -> None:
                 subscription.get("error", "unknown"),
             )
 
-    output_files = create_output_files(timestamp, topology)
-    if not output_files:
+    output_mode = os.environ.get("OUTPUT_MODE", "storage").strip().lower()
+    if output_mode not in ("storage", "confluence"):
+        logging.warning("Unsupported OUTPUT_MODE '%s'. Falling back to storage-only behavior.", output_mode)
+        output_mode = "storage"
+
+    normalize_topology(topology)
+    topology_payload = serialize_topology(topology)
+    if topology_payload is None:
         return
 
-    blob_service_client = create_blob_service_client(credential)
-    if blob_service_client is None:
+    # Same topology, destinations and renderer means the same artifacts;
+    # skip rendering and exports.
+    try:
+        topology_hash = compute_export_hash(topology_payload, output_mode)
+    except Exception as exc:
+        logging.exception("Failed to compute export hash: %s", exc)
         return
 
-    upload_outputs_to_blob(blob_service_client, output_files)
+    if is_setting_enabled("FORCE_REGENERATE"):
+        logging.info("FORCE_REGENERATE is set; regenerating diagrams regardless of topology hash")
+    elif get_previous_topology_hash(blob_service_client) == topology_hash:
+        logging.info("Topology and export settings unchanged since the last export (hash %s); skipping diagram generation", topology_hash)
+        return
 
-    output_mode = os.environ.get("OUTPUT_MODE", "storage").strip().lower()
-    if output_mode == "confluence":
-        upload_outputs_to_confluence(output_files)
-    elif output_mode != "storage":
-        logging.warning("Unsupported OUTPUT_MODE '%s'. Falling back to storage-only behavior.", output_mode)
+    outputs = create_outputs(timestamp, topology, topology_payload)
+    if not outputs:
+        return
+
+    confluence_settings = get_confluence_settings() if output_mode == "confluence" else None
+
+    # Blob Storage and Confluence are independent destinations, so export to
+    # both at once rather than waiting on the blob uploads first. The exporters
+    # only return per-artifact results; they are logged here, on the invocation
+    # thread, so the records keep the Functions invocation id.
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        blob_future = executor.submit(upload_outputs_to_blob, blob_service_client, outputs)
+        confluence_future = None
+        if confluence_settings is not None:
+            confluence_future = executor.submit(upload_outputs_to_confluence, outputs, confluence_settings)
+
+        exported = log_upload_results("Blob Storage", blob_future.result())
+        if confluence_future is not None:
+            destination = f"Confluence page {confluence_settings['page_id']}"
+            exported = log_upload_results(destination, confluence_future.result()) and exported
+        elif output_mode == "confluence":
+            exported = False
+
+    # Only record the hash once every destination has the new artifacts, so a
+    # failed export is retried on the next run even if nothing changed.
+    if exported:
+        store_topology_hash(blob_service_client, topology_hash)
+    else:
+        logging.warning("Not all outputs were exported; topology hash left unchanged so the next run retries")
 
     logging.info("DrawTrigger function execution completed successfully")
 
 
-def get_target_subscription_ids() -> List[str]:
+def get_configured_subscription_ids() -> List[str]:
+    """Return SELECTED_SUBSCRIPTION_IDS, or an empty list when all accessible subscriptions should be used."""
     configured_subscription_ids = os.environ.get("SELECTED_SUBSCRIPTION_IDS", "").strip()
     if configured_subscription_ids:
         try:
@@ -86,42 +204,113 @@ def get_target_subscription_ids() -> List[str]:
 
         logging.warning("SELECTED_SUBSCRIPTION_IDS was set but no valid subscription IDs were found; falling back to all accessible subscriptions")
 
-    subscription_ids = azure_client.get_all_subscription_ids()
-    logging.info("No explicit subscription selection provided; discovered %s accessible subscriptions", len(subscription_ids))
-    return subscription_ids
+    return []
+
 
+def normalize_topology(topology: Dict[str, object]) -> None:
+    """Sort ARM-ordered lists in place so unchanged topologies serialize and render identically."""
+    # ARM does not guarantee list order for subscriptions, VNets or peerings.
+    vnets = topology.get("vnets", [])
+    for vnet in vnets:
+        vnet["peering_resource_ids"] = sorted(vnet.get("peering_resource_ids", []))
+    vnets.sort(key=lambda vnet: vnet.get("resource_id", ""))
+    topology.get("inaccessible_subscriptions", []).sort(key=lambda entry: entry.get("subscription_id", ""))
 
-def create_output_files(timestamp: str, topology: Dict[str, object]) -> Dict[str, Path]:
-    """Persist topology and generated diagrams to temporary files."""
-    json_file_path = Path("/tmp") / f"{timestamp}_network_topology.json"
-    diagram_file_path_mld = Path("/tmp") / f"{timestamp}_network_diagram_MLD.drawio"
-    diagram_file_path_hld = Path("/tmp") / f"{timestamp}_network_diagram_HLD.drawio"
 
+def serialize_topology(topology: Dict[str, object]) -> bytes | None:
+    """Serialize the topology once for hashing and upload; the generators work off the dict."""
+    # Compact by default; DEBUG_JSON restores the indented, human-readable form.
     try:
-        json_file_path.write_text(json.dumps(topology, indent=2), encoding="utf-8")
-        logging.info("Saved topology JSON to %s", json_file_path)
+        if is_setting_enabled("DEBUG_JSON"):
+            return json.dumps(topology, indent=2, sort_keys=True).encode("utf-8")
+        return json.dumps(topology, separators=(",", ":"), sort_keys=True).encode("utf-8")
     except Exception as exc:
-        logging.exception("Failed to write topology JSON: %s", exc)
-        return {}
+        logging.exception("Failed to serialize topology JSON: %s", exc)
+        return None
+
+
+def compute_export_hash(topology_payload: bytes, output_mode: str) -> str:
+    """Digest every input that shapes the exported artifacts: topology, destinations and renderer."""
+    destination_settings = [output_mode, is_setting_enabled("COMPRESS_TOPOLOGY_JSON")]
+    if output_mode == "confluence":
+        destination_settings += [
+            os.environ.get(name, "").strip()
+            for name in ("CONFLUENCE_BASE_URL", "CONFLUENCE_PAGE_ID", "CONFLUENCE_ATTACHMENT_PREFIX")
+        ]
+
+    digest = hashlib.blake2b(topology_payload, digest_size=16)
+    digest.update(json.dumps(destination_settings).encode("utf-8"))
+    digest.update(get_renderer_fingerprint())
+    return digest.hexdigest()
+
+
+@lru_cache(maxsize=1)
+def get_renderer_fingerprint() -> bytes:
+    """Digest of the cloudnetdraw sources and diagram config file; fixed for the life of the worker."""
+    import cloudnetdraw
+
+    # __version__ is "dev" when the package ships inside the function zip, so
+    # the sources themselves are hashed to pick up renderer changes.
+    digest = hashlib.blake2b(cloudnetdraw.__version__.encode("utf-8"), digest_size=16)
+    for source_path in sorted(Path(cloudnetdraw.__file__).parent.glob("*.py")):
+        digest.update(source_path.read_bytes())
+    digest.update(Path(get_diagram_config().config_file).read_bytes())
+    return digest.digest()
+
+
+def get_previous_topology_hash(blob_service_client: BlobServiceClient) -> str | None:
+    from azure.core.exceptions import ResourceNotFoundError
+
+    container_name = os.environ["DRAWING_CONTAINER_NAME"]
+    try:
+        blob_client = blob_service_client.get_blob_client(container=container_name, blob=TOPOLOGY_HASH_BLOB_NAME)
+        return blob_client.download_blob().readall().decode("utf-8").strip()
+    except ResourceNotFoundError:
+        return None
+    except Exception as exc:
+        logging.warning("Could not read previous topology hash; regenerating diagrams: %s", exc)
+        return None
 
-    config = Config()
+
+def store_topology_hash(blob_service_client: BlobServiceClient, topology_hash: str) -> None:
+    container_name = os.environ["DRAWING_CONTAINER_NAME"]
     try:
-        generate_mld_diagram(str(diagram_file_path_mld), str(json_file_path), config)
-        logging.info("Generated MLD diagram at %s", diagram_file_path_mld)
-        generate_hld_diagram(str(diagram_file_path_hld), str(json_file_path), config)
-        logging.info("Generated HLD diagram at %s", diagram_file_path_hld)
+        upload_payload_to_blob(blob_service_client, container_name, TOPOLOGY_HASH_BLOB_NAME, topology_hash.encode("utf-8"))
+    except Exception as exc:
+        logging.exception("Failed to store topology hash: %s", exc)
+
+
+def create_outputs(
+    timestamp: str,
+    topology: Dict[str, object],
+    topology_payload: bytes,
+) -> Dict[str, Tuple[str, bytes]]:
+    """Render generated diagrams and pair them with the topology JSON as in-memory (name, payload) pairs."""
+    from cloudnetdraw.diagram_generator import generate_hld_diagram_from_topology, generate_mld_diagram_from_topology
+
+    config = get_diagram_config()
+    diagram_mld = io.BytesIO()
+    diagram_hld = io.BytesIO()
+    try:
+        generate_mld_diagram_from_topology(diagram_mld, topology, config)
+        logging.info("Generated MLD diagram (%s bytes)", diagram_mld.tell())
+        generate_hld_diagram_from_topology(diagram_hld, topology, config)
+        logging.info("Generated HLD diagram (%s bytes)", diagram_hld.tell())
     except Exception as exc:
         logging.exception("Failed to generate diagrams: %s", exc)
         return {}
 
     return {
-        "topology_json": json_file_path,
-        "diagram_mld": diagram_file_path_mld,
-        "diagram_hld": diagram_file_path_hld,
+        "topology_json": (f"{timestamp}_network_topology.json", topology_payload),
+        "diagram_mld": (f"{timestamp}_network_diagram_MLD.drawio", diagram_mld.getvalue()),
+        "diagram_hld": (f"{timestamp}_network_diagram_HLD.drawio", diagram_hld.getvalue()),
     }
 
 
-def create_blob_service_client(credential: DefaultAzureCredential) -> BlobServiceClient | None:
+def get_blob_service_client() -> BlobServiceClient | None:
+    """Return the worker-wide BlobServiceClient, creating it on first use."""
+    global _BLOB_SERVICE_CLIENT
+
     account_url = os.environ.get("DRAWING_STORAGE_URL")
     container_name = os.environ.get("DRAWING_CONTAINER_NAME")
 
@@ -129,43 +318,120 @@ def create_blob_service_client(credential: DefaultAzureCredential) -> BlobServic
         logging.error("Storage configuration missing: DRAWING_STORAGE_URL and DRAWING_CONTAINER_NAME must be set")
         return None
 
-    return BlobServiceClient(account_url=account_url, credential=credential)
+    from azure.storage.blob import BlobServiceClient
+
+    with _BLOB_SERVICE_CLIENT_LOCK:
+        if _BLOB_SERVICE_CLIENT is None:
+            # Payloads above 4 MiB are split into 4 MiB blocks so upload_blob can
+            # stage them in parallel instead of streaming one large PUT.
+            _BLOB_SERVICE_CLIENT = BlobServiceClient(
+                account_url=account_url,
+                credential=_CREDENTIAL,
+                max_single_put_size=BLOB_BLOCK_SIZE,
+                max_block_size=BLOB_BLOCK_SIZE,
+            )
+        return _BLOB_SERVICE_CLIENT
 
 
-def upload_outputs_to_blob(blob_service_client: BlobServiceClient, output_files: Dict[str, Path]) -> None:
-    container_name = os.environ["DRAWING_CONTAINER_NAME"]
+@lru_cache(maxsize=1)
+def get_diagram_config() -> Config:
+    """Load and validate the diagram configuration once per worker; it is read-only after load."""
+    from cloudnetdraw.config import Config
 
-    for _, file_path in output_files.items():
-        try:
-            blob_client = blob_service_client.get_blob_client(container=container_name, blob=file_path.name)
-            with file_path.open("rb") as data:
-                blob_client.upload_blob(data, overwrite=True)
-            logging.info("Uploaded %s to Blob Storage", file_path.name)
-        except Exception as exc:
-            logging.exception("Failed to upload %s to Blob Storage: %s", file_path.name, exc)
+    return Config()
 
 
-def upload_outputs_to_confluence(output_files: Dict[str, Path]) -> None:
-    settings = get_confluence_settings()
-    if settings is None:
-        return
+def upload_outputs_to_blob(
+    blob_service_client: BlobServiceClient,
+    outputs: Dict[str, Tuple[str, bytes]],
+) -> Dict[str, BaseException | None]:
+    """Upload every output to the drawing container; returns each blob name's error, or None on success."""
+    container_name = os.environ["DRAWING_CONTAINER_NAME"]
 
-    session = requests.Session()
-    session.auth = HTTPBasicAuth(settings["username"], settings["api_token"])
-    session.headers.update({"Accept": "application/json", "X-Atlassian-Token": "no-check"})
+    # Each upload is a small, independent PUT dominated by round-trip latency,
+    # so run them side by side and report every result on its own.
+    with ThreadPoolExecutor(max_workers=len(outputs)) as executor:
+        futures = {
+            blob_name: executor.submit(upload_payload_to_blob, blob_service_client, container_name, blob_name, payload)
+            for blob_name, payload in outputs.values()
+        }
+        return {blob_name: future.exception() for blob_name, future in futures.items()}
+
+
+def log_upload_results(destination: str, results: Dict[str, BaseException | None]) -> bool:
+    """Log each upload outcome; returns True when every upload succeeded."""
+    succeeded = True
+    for name, exc in results.items():
+        if exc is None:
+            logging.info("Uploaded %s to %s", name, destination)
+        else:
+            succeeded = False
+            logging.error("Failed to upload %s to %s: %s", name, destination, exc, exc_info=exc)
+
+    return succeeded
+
+
+def upload_payload_to_blob(
+    blob_service_client: BlobServiceClient,
+    container_name: str,
+    blob_name: str,
+    payload: bytes,
+) -> None:
+    from azure.storage.blob import ContentSettings
+
+    blob_client = blob_service_client.get_blob_client(container=container_name, blob=blob_name)
+
+    # Blob properties go on the upload itself, so no follow-up set-properties
+    # (or batch) request is needed per artifact.
+    content_settings = ContentSettings(content_type=guess_content_type(blob_name))
+    if blob_name.endswith(".json") and is_setting_enabled("COMPRESS_TOPOLOGY_JSON"):
+        payload = gzip.compress(payload, compresslevel=1)
+        content_settings.content_encoding = "gzip"
+
+    blob_client.upload_blob(
+        payload,
+        overwrite=True,
+        content_settings=content_settings,
+        max_concurrency=BLOB_UPLOAD_CONCURRENCY,
+    )
 
-    for attachment_name, file_path in iter_confluence_attachments(output_files, settings["attachment_prefix"]):
+
+def upload_outputs_to_confluence(
+    outputs: Dict[str, Tuple[str, bytes]],
+    settings: Dict[str, str],
+) -> Dict[str, BaseException | None]:
+    """Attach every output to the Confluence page; returns each attachment's error, or None on success."""
+    session = create_confluence_session(settings)
+    results: Dict[str, BaseException | None] = {}
+
+    for attachment_name, payload in iter_confluence_attachments(outputs, settings["attachment_prefix"]):
         try:
             upload_confluence_attachment(
                 session=session,
                 base_url=settings["base_url"],
                 page_id=settings["page_id"],
                 attachment_name=attachment_name,
-                file_path=file_path,
+                payload=payload,
             )
-            logging.info("Uploaded %s to Confluence page %s", attachment_name, settings["page_id"])
+            results[attachment_name] = None
         except Exception as exc:
-            logging.exception("Failed to upload %s to Confluence: %s", attachment_name, exc)
+            results[attachment_name] = exc
+
+    return results
+
+
+def is_setting_enabled(name: str) -> bool:
+    return os.environ.get(name, "").strip().lower() in ("1", "true", "yes")
+
+
+def create_confluence_session(settings: Dict[str, str]) -> requests.Session:
+    """Build a per-run authenticated Session on top of the shared Confluence connection pool."""
+    # Not closed after use: Session.close() would also close the shared adapter's pool.
+    session = requests.Session()
+    session.mount("https://", _CONFLUENCE_HTTP_ADAPTER)
+    session.auth = HTTPBasicAuth(settings["username"], settings["api_token"])
+    session.headers.update({"Accept": "application/json", "X-Atlassian-Token": "no-check"})
+    return session
 
 
 def get_confluence_settings() -> Dict[str, str] | None:
@@ -189,12 +455,12 @@ def get_confluence_settings() -> Dict[str, str] | None:
 
 
 def iter_confluence_attachments(
-    output_files: Dict[str, Path],
+    outputs: Dict[str, Tuple[str, bytes]],
     attachment_prefix: str,
-) -> Iterable[Tuple[str, Path]]:
-    yield f"{attachment_prefix}.json", output_files["topology_json"]
-    yield f"{attachment_prefix}-mld.drawio", output_files["diagram_mld"]
-    yield f"{attachment_prefix}-hld.drawio", output_files["diagram_hld"]
+) -> Iterable[Tuple[str, bytes]]:
+    yield f"{attachment_prefix}.json", outputs["topology_json"][1]
+    yield f"{attachment_prefix}-mld.drawio", outputs["diagram_mld"][1]
+    yield f"{attachment_prefix}-hld.drawio", outputs["diagram_hld"][1]
 
 
 def upload_confluence_attachment(
@@ -202,19 +468,18 @@ def upload_confluence_attachment(
     base_url: str,
     page_id: str,
     attachment_name: str,
-    file_path: Path,
+    payload: bytes,
 ) -> None:
     create_url, update_url = resolve_confluence_attachment_urls(session, base_url, page_id, attachment_name)
 
     attachment_id = find_existing_attachment_id(session, create_url, attachment_name)
     upload_url = update_url.format(attachment_id=attachment_id) if attachment_id else create_url
 
-    with file_path.open("rb") as file_handle:
-        response = session.post(
-            upload_url,
-            files={"file": (attachment_name, file_handle, guess_content_type(file_path))},
-            timeout=30,
-        )
+    response = session.post(
+        upload_url,
+        files={"file": (attachment_name, payload, guess_content_type(attachment_name))},
+        timeout=CONFLUENCE_UPLOAD_TIMEOUT,
+    )
 
     response.raise_for_status()
 
@@ -232,7 +497,7 @@ def resolve_confluence_attachment_urls(
             response = session.get(
                 create_url,
                 params={"filename": attachment_name, "limit": 1},
-                timeout=15,
+                timeout=CONFLUENCE_LOOKUP_TIMEOUT,
             )
         except requests.RequestException:
             continue
@@ -259,7 +524,7 @@ def find_existing_attachment_id(
     response = session.get(
         attachment_collection_url,
         params={"filename": attachment_name, "limit": 1},
-        timeout=15,
+        timeout=CONFLUENCE_LOOKUP_TIMEOUT,
     )
     response.raise_for_status()
 
@@ -271,7 +536,7 @@ def find_existing_attachment_id(
     return attachment.get("id")
 
 
-def guess_content_type(file_path: Path) -> str:
-    if file_path.suffix == ".json":
+def guess_content_type(file_name: str) -> str:
+    if Path(file_name).suffix == ".json":
         return "application/json"
     return "application/octet-stream"
@@ -6,6 +6,7 @@ import os
 import re
 import sys
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Any, Optional, Union, Tuple
 
 from azure.identity import AzureCliCredential, ClientSecretCredential
@@ -30,6 +31,9 @@ from azure.core.exceptions import ResourceNotFoundError
 
 from .utils import extract_resource_group, parse_vnet_identifier
 
+# Upper bound on subscriptions queried concurrently during topology discovery
+MAX_SUBSCRIPTION_WORKERS = 8
+
 # Global credentials
 _credentials: Optional[Union[ClientSecretCredential, AzureCliCredential]] = None
 
@@ -378,167 +382,185 @@ def find_peered_vnets(peering_resource_ids: List[str]) -> Tuple[List[Dict[str, A
     return peered_vnets, accessible_resource_ids
 
 
-def get_vnet_topology_for_selected_subscriptions(subscription_ids: List[str]) -> Dict[str, Any]:
-    """Collect all VNets and their details across selected subscriptions"""
-    network_data = {
-        "vnets": [],
-        "inaccessible_subscriptions": [],
-        "subscription_access_summary": {
-            "requested": len(subscription_ids),
-            "accessible": 0,
-            "inaccessible": 0
-        }
-    }
+def _collect_subscription_vnets(subscription_client: SubscriptionClient, subscription_id: str) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """Collect VNets and virtual hubs for one subscription, plus an access error entry if it could not be fully read"""
     vnet_candidates = []
-    
-    subscription_client = SubscriptionClient(get_credentials())
-
-    for subscription_id in subscription_ids:
-        logging.info(f"Processing Subscription: {subscription_id}")
-        network_client = NetworkManagementClient(get_credentials(), subscription_id)
+    logging.info(f"Processing Subscription: {subscription_id}")
+    network_client = NetworkManagementClient(get_credentials(), subscription_id)
 
-        # Get subscription name and tenant info
-        try:
-            subscription = subscription_client.subscriptions.get(subscription_id)
-            subscription_name = subscription.display_name
-            tenant_id = subscription.tenant_id
-            
-        except Exception as e:
-            error_msg = f"Could not access subscription {subscription_id}: {e}"
-            logging.error(error_msg)
-            network_data["inaccessible_subscriptions"].append({
-                "subscription_id": subscription_id,
-                "stage": "subscription_lookup",
-                "error": str(e)
-            })
-            continue
-
-        # Detect Virtual WAN Hub if it exists - add to vnets array
-        try:
-            for vwan in network_client.virtual_wans.list():
-                try:
-                    # Correctly retrieve virtual hubs associated with the Virtual WAN
-                    hubs = network_client.virtual_hubs.list_by_resource_group(extract_resource_group(vwan.id))
-                    for hub in hubs:
-                        # Detect ExpressRoute or VPN based on hub properties (fallback to flags if needed)
-                        has_expressroute = hasattr(hub, "express_route_gateway") and hub.express_route_gateway is not None
-                        has_vpn_gateway = hasattr(hub, "vpn_gateway") and hub.vpn_gateway is not None
-                        has_firewall = hasattr(hub, "azure_firewall") and hub.azure_firewall is not None
-
-                        # Extract resource group from hub resource ID
-                        hub_resource_group = extract_resource_group(hub.id)
-                        
-                        # Construct resourcegroup_id from resource_id
-                        resourcegroup_id = f"/subscriptions/{subscription_id}/resourceGroups/{hub_resource_group}"
-                        
-                        # Construct Azure console hyperlink
-                        azure_console_url = f"https://portal.azure.com/#@{tenant_id}/resource{hub.id}"
-                        
-                        virtual_hub_info = {
-                            "name": hub.name,
-                            "address_space": hub.address_prefix,
-                            "type": "virtual_hub",
-                            "subnets": [],  # Virtual hubs don't have traditional subnets
-                              # Will be populated if needed
-                            "resource_id": hub.id,
-                            "tenant_id": tenant_id,
-                            "subscription_id": subscription_id,
-                            "subscription_name": subscription_name,
-                            "resourcegroup_id": resourcegroup_id,
-                            "resourcegroup_name": hub_resource_group,
-                            "azure_console_url": azure_console_url,
-                            "expressroute": "Yes" if has_expressroute else "No",
-                            "vpn_gateway": "Yes" if has_vpn_gateway else "No",
-                            "firewall": "Yes" if has_firewall else "No",
-                            "peering_resource_ids": [],  # Virtual hubs use different connectivity model
-                            "peerings_count": 0  # Virtual hubs use different connectivity model
-                        }
-                        vnet_candidates.append(virtual_hub_info)
-                except Exception as e:
-                    logging.warning(
-                        "Could not retrieve virtual hub details for %s in subscription %s: %s",
-                        vwan.name,
-                        subscription_id,
-                        e,
-                    )
-        except Exception as e:
-            logging.warning("Could not list virtual WANs for subscription %s: %s", subscription_id, e)
-
-        # Process VNets
-        subscription_vnet_error = None
-        try:
-            for vnet in network_client.virtual_networks.list_all():
-                try:
-                    resource_group_name = extract_resource_group(vnet.id)
-                    subnet_names = [subnet.name for subnet in vnet.subnets]
+    # Get subscription name and tenant info
+    try:
+        subscription = subscription_client.subscriptions.get(subscription_id)
+        subscription_name = subscription.display_name
+        tenant_id = subscription.tenant_id
+        
+    except Exception as e:
+        error_msg = f"Could not access subscription {subscription_id}: {e}"
+        logging.error(error_msg)
+        return [], {
+            "subscription_id": subscription_id,
+            "stage": "subscription_lookup",
+            "error": str(e)
+        }
 
+    # Detect Virtual WAN Hub if it exists - add to vnets array
+    try:
+        for vwan in network_client.virtual_wans.list():
+            try:
+                # Correctly retrieve virtual hubs associated with the Virtual WAN
+                hubs = network_client.virtual_hubs.list_by_resource_group(extract_resource_group(vwan.id))
+                for hub in hubs:
+                    # Detect ExpressRoute or VPN based on hub properties (fallback to flags if needed)
+                    has_expressroute = hasattr(hub, "express_route_gateway") and hub.express_route_gateway is not None
+                    has_vpn_gateway = hasattr(hub, "vpn_gateway") and hub.vpn_gateway is not None
+                    has_firewall = hasattr(hub, "azure_firewall") and hub.azure_firewall is not None
+
+                    # Extract resource group from hub resource ID
+                    hub_resource_group = extract_resource_group(hub.id)
+                    
                     # Construct resourcegroup_id from resource_id
-                    resourcegroup_id = f"/subscriptions/{subscription_id}/resourceGroups/{resource_group_name}"
+                    resourcegroup_id = f"/subscriptions/{subscription_id}/resourceGroups/{hub_resource_group}"
                     
                     # Construct Azure console hyperlink
-                    azure_console_url = f"https://portal.azure.com/#@{tenant_id}/resource{vnet.id}"
+                    azure_console_url = f"https://portal.azure.com/#@{tenant_id}/resource{hub.id}"
                     
-                    vnet_info = {
-                        "name": vnet.name,
-                        "address_space": vnet.address_space.address_prefixes[0],
-                        "subnets": [
-                            {
-                                "name": subnet.name,
-                                "address": (
-                                    subnet.address_prefixes[0]
-                                    if hasattr(subnet, "address_prefixes") and subnet.address_prefixes
-                                    else subnet.address_prefix or "N/A"
-                                ),
-                                "nsg": 'Yes' if subnet.network_security_group else 'No',
-                                "udr": 'Yes' if subnet.route_table else 'No'
-                            }
-                            for subnet in vnet.subnets
-                        ],
-                        
-                        "resource_id": vnet.id,
+                    virtual_hub_info = {
+                        "name": hub.name,
+                        "address_space": hub.address_prefix,
+                        "type": "virtual_hub",
+                        "subnets": [],  # Virtual hubs don't have traditional subnets
+                          # Will be populated if needed
+                        "resource_id": hub.id,
                         "tenant_id": tenant_id,
                         "subscription_id": subscription_id,
                         "subscription_name": subscription_name,
                         "resourcegroup_id": resourcegroup_id,
-                        "resourcegroup_name": resource_group_name,
+                        "resourcegroup_name": hub_resource_group,
                         "azure_console_url": azure_console_url,
-                        "expressroute": "Yes" if "GatewaySubnet" in subnet_names else "No",
-                        "vpn_gateway": "Yes" if "GatewaySubnet" in subnet_names else "No",
-                        "firewall": "Yes" if "AzureFirewallSubnet" in subnet_names else "No"
+                        "expressroute": "Yes" if has_expressroute else "No",
+                        "vpn_gateway": "Yes" if has_vpn_gateway else "No",
+                        "firewall": "Yes" if has_firewall else "No",
+                        "peering_resource_ids": [],  # Virtual hubs use different connectivity model
+                        "peerings_count": 0  # Virtual hubs use different connectivity model
                     }
+                    vnet_candidates.append(virtual_hub_info)
+            except Exception as e:
+                logging.warning(
+                    "Could not retrieve virtual hub details for %s in subscription %s: %s",
+                    vwan.name,
+                    subscription_id,
+                    e,
+                )
+    except Exception as e:
+        logging.warning("Could not list virtual WANs for subscription %s: %s", subscription_id, e)
 
-                    # Get peerings for this VNet - store resource IDs instead of names
-                    peerings = network_client.virtual_network_peerings.list(resource_group_name, vnet.name)
-                    peering_resource_ids = []
-                    for peering in peerings:
-                        if peering.remote_virtual_network and peering.remote_virtual_network.id:
-                            peering_resource_ids.append(peering.remote_virtual_network.id)
-                    
-                    vnet_info["peering_resource_ids"] = peering_resource_ids
-                    vnet_info["peerings_count"] = len(peering_resource_ids)
-                    vnet_candidates.append(vnet_info)
-                    
-                except Exception as e:
-                    logging.warning(
-                        "Could not process VNet %s in subscription %s: %s",
-                        vnet.name,
-                        subscription_id,
-                        e,
-                    )
+    # Process VNets
+    subscription_vnet_error = None
+    try:
+        for vnet in network_client.virtual_networks.list_all():
+            try:
+                resource_group_name = extract_resource_group(vnet.id)
+                subnet_names = [subnet.name for subnet in vnet.subnets]
+
+                # Construct resourcegroup_id from resource_id
+                resourcegroup_id = f"/subscriptions/{subscription_id}/resourceGroups/{resource_group_name}"
+                
+                # Construct Azure console hyperlink
+                azure_console_url = f"https://portal.azure.com/#@{tenant_id}/resource{vnet.id}"
+                
+                vnet_info = {
+                    "name": vnet.name,
+                    "address_space": vnet.address_space.address_prefixes[0],
+                    "subnets": [
+                        {
+                            "name": subnet.name,
+                            "address": (
+                                subnet.address_prefixes[0]
+                                if hasattr(subnet, "address_prefixes") and subnet.address_prefixes
+                                else subnet.address_prefix or "N/A"
+                            ),
+                            "nsg": 'Yes' if subnet.network_security_group else 'No',
+                            "udr": 'Yes' if subnet.route_table else 'No'
+                        }
+                        for subnet in vnet.subnets
+                    ],
                     
-        except Exception as e:
-            subscription_vnet_error = str(e)
-            logging.error("Could not retrieve VNets for subscription %s: %s", subscription_id, e)
+                    "resource_id": vnet.id,
+                    "tenant_id": tenant_id,
+                    "subscription_id": subscription_id,
+                    "subscription_name": subscription_name,
+                    "resourcegroup_id": resourcegroup_id,
+                    "resourcegroup_name": resource_group_name,
+                    "azure_console_url": azure_console_url,
+                    "expressroute": "Yes" if "GatewaySubnet" in subnet_names else "No",
+                    "vpn_gateway": "Yes" if "GatewaySubnet" in subnet_names else "No",
+                    "firewall": "Yes" if "AzureFirewallSubnet" in subnet_names else "No"
+                }
 
-        if subscription_vnet_error:
-            network_data["inaccessible_subscriptions"].append({
-                "subscription_id": subscription_id,
-                "subscription_name": subscription_name,
-                "stage": "vnet_enumeration",
-                "error": subscription_vnet_error
-            })
-        else:
-            network_data["subscription_access_summary"]["accessible"] += 1
+                # Get peerings for this VNet - store resource IDs instead of names
+                peerings = network_client.virtual_network_peerings.list(resource_group_name, vnet.name)
+                peering_resource_ids = []
+                for peering in peerings:
+                    if peering.remote_virtual_network and peering.remote_virtual_network.id:
+                        peering_resource_ids.append(peering.remote_virtual_network.id)
+                
+                vnet_info["peering_resource_ids"] = peering_resource_ids
+                vnet_info["peerings_count"] = len(peering_resource_ids)
+                vnet_candidates.append(vnet_info)
+                
+            except Exception as e:
+                logging.warning(
+                    "Could not process VNet %s in subscription %s: %s",
+                    vnet.name,
+                    subscription_id,
+                    e,
+                )
+                
+    except Exception as e:
+        subscription_vnet_error = str(e)
+        logging.error("Could not retrieve VNets for subscription %s: %s", subscription_id, e)
+
+    if subscription_vnet_error:
+        return vnet_candidates, {
+            "subscription_id": subscription_id,
+            "subscription_name": subscription_name,
+            "stage": "vnet_enumeration",
+            "error": subscription_vnet_error
+        }
+
+    return vnet_candidates, None
+
+
+def get_vnet_topology_for_selected_subscriptions(subscription_ids: List[str]) -> Dict[str, Any]:
+    """Collect all VNets and their details across selected subscriptions"""
+    network_data = {
+        "vnets": [],
+        "inaccessible_subscriptions": [],
+        "subscription_access_summary": {
+            "requested": len(subscription_ids),
+            "accessible": 0,
+            "inaccessible": 0
+        }
+    }
+    vnet_candidates = []
+    
+    subscription_client = SubscriptionClient(get_credentials())
+
+    # Each subscription is an independent set of ARM list calls, so fan them out.
+    # The pool size bounds concurrent ARM traffic; 429s are retried with
+    # Retry-After backoff by the SDK's own retry policy.
+    max_workers = max(1, min(MAX_SUBSCRIPTION_WORKERS, len(subscription_ids)))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(
+            lambda subscription_id: _collect_subscription_vnets(subscription_client, subscription_id),
+            subscription_ids,
+        )
+        for subscription_vnets, access_error in results:
+            vnet_candidates.extend(subscription_vnets)
+            if access_error is None:
+                network_data["subscription_access_summary"]["accessible"] += 1
+            else:
+                network_data["inaccessible_subscriptions"].append(access_error)
 
     # All VNets are equal - no hub detection needed
     network_data["vnets"] = vnet_candidates
@@ -5,7 +5,7 @@ Handles unified HLD/MLD generation, VNet rendering, and XML structure
 import json
 import logging
 import sys
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Union, BinaryIO
 
 from .layout import _classify_spoke_vnets, _create_layout_zones
 from .edge_system import EdgeClassifier, EdgeRenderer
@@ -13,12 +13,17 @@ from .topology import create_vnet_id_mapping
 from .utils import generate_hierarchical_id
 
 
-def _load_and_validate_topology(topology_file: str) -> List[Dict[str, Any]]:
-    """Extract common file loading and validation logic"""
+def _load_topology(topology_file: str) -> Dict[str, Any]:
+    """Extract common file loading logic"""
     with open(topology_file, 'r') as file:
         topology = json.load(file)
 
     logging.info("Loaded topology data from JSON")
+    return topology
+
+
+def _validate_topology(topology: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Return the VNet list from parsed topology data, exiting if it is empty"""
     vnets = topology.get("vnets", [])
     
     # Check for empty VNet list - this should be fatal
@@ -471,16 +476,29 @@ def _add_vnet_with_optional_subnets(vnet_data, x_offset, y_offset, root, config,
     return group_height
 
 
-def generate_diagram(filename: str, topology_file: str, config: Any, render_mode: str = 'hld') -> None:
+def generate_diagram(filename: Union[str, BinaryIO], topology_file: str, config: Any, render_mode: str = 'hld') -> None:
     """
     Unified diagram generation function that handles both HLD and MLD modes
     
     Args:
-        filename: Output DrawIO filename
+        filename: Output DrawIO filename or writable binary stream
         topology_file: Input topology JSON file
         config: Configuration object
         render_mode: 'hld' for high-level (VNets only) or 'mld' for mid-level (VNets + subnets)
     """
+    generate_diagram_from_topology(filename, _load_topology(topology_file), config, render_mode)
+
+
+def generate_diagram_from_topology(filename: Union[str, BinaryIO], topology: Dict[str, Any], config: Any, render_mode: str = 'hld') -> None:
+    """
+    Generate an HLD or MLD diagram from already-parsed topology data
+    
+    Args:
+        filename: Output DrawIO filename or writable binary stream
+        topology: Topology data as produced by the query command
+        config: Configuration object
+        render_mode: 'hld' for high-level (VNets only) or 'mld' for mid-level (VNets + subnets)
+    """
     from lxml import etree
     
     # Validate render_mode
@@ -489,8 +507,8 @@ def generate_diagram(filename: str, topology_file: str, config: Any, render_mode
     
     show_subnets = render_mode == 'mld'
     
-    # Load topology and create EdgeClassifier for hub/spoke classification
-    vnets = _load_and_validate_topology(topology_file)
+    # Validate topology and create EdgeClassifier for hub/spoke classification
+    vnets = _validate_topology(topology)
     edge_classifier = EdgeClassifier(vnets, config)
     
     # Get classified VNets from EdgeClassifier (single source of truth)
@@ -702,18 +720,32 @@ def generate_diagram(filename: str, topology_file: str, config: Any, render_mode
     
     logging.info(f"Added {edge_classification.edge_count} peering connections using unified edge system")
 
-    # Write to file
+    # Write to file, or straight into a caller-supplied binary stream
     tree = etree.ElementTree(mxfile)
+    if hasattr(filename, "write"):
+        tree.write(filename, encoding="utf-8", xml_declaration=True, pretty_print=True)
+        logging.info("Draw.io diagram generated into output stream")
+        return
     with open(filename, "wb") as f:
         tree.write(f, encoding="utf-8", xml_declaration=True, pretty_print=True)
     logging.info(f"Draw.io diagram generated and saved to {filename}")
 
 
-def generate_hld_diagram(filename: str, topology_file: str, config: Any) -> None:
+def generate_hld_diagram(filename: Union[str, BinaryIO], topology_file: str, config: Any) -> None:
     """Generate high-level diagram (VNets only) from topology JSON"""
     generate_diagram(filename, topology_file, config, render_mode='hld')
 
 
-def generate_mld_diagram(filename: str, topology_file: str, config: Any) -> None:
+def generate_mld_diagram(filename: Union[str, BinaryIO], topology_file: str, config: Any) -> None:
     """Generate mid-level diagram (VNets + subnets) from topology JSON"""
-    generate_diagram(filename, topology_file, config, render_mode='mld')
\ No newline at end of file
+    generate_diagram(filename, topology_file, config, render_mode='mld')
+
+
+def generate_hld_diagram_from_topology(filename: Union[str, BinaryIO], topology: Dict[str, Any], config: Any) -> None:
+    """Generate high-level diagram (VNets only) from parsed topology data"""
+    generate_diagram_from_topology(filename, topology, config, render_mode='hld')
+
+
+def generate_mld_diagram_from_topology(filename: Union[str, BinaryIO], topology: Dict[str, Any], config: Any) -> None:
+    """Generate mid-level diagram (VNets + subnets) from parsed topology data"""
+    generate_diagram_from_topology(filename, topology, config, render_mode='mld')